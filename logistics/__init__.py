@@ -13,11 +13,16 @@
 # company4supplier4@company4.com - supplier
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import Flask, render_template
 from flask_bootstrap import Bootstrap5
 
 
+# Instance folders already created by create_app() in this process
+_ready_instance_paths = set()
+
+
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__, instance_relative_config=True)
@@ -30,7 +35,8 @@ def create_app(test_config=None):
 
     app.config.from_mapping(
         SECRET_KEY=os.environ.get('FLASK_KEY'),
-        DATABASE=os.path.join(app.instance_path, "logistics.sqlite")
+        DATABASE=os.path.join(app.instance_path, "logistics.sqlite"),
+        PAGE_SIZE=50
     )
      
     
@@ -41,11 +47,13 @@ def create_app(test_config=None):
         # load the test config if passed in
         app.config.from_mapping(test_config)
         
-    # ensure that the instance folder exists
-    try:
-        os.mkdir(app.instance_path)
-    except OSError:
-        pass
+    # thread pool for password hashing, sized to the number of CPUs
+    app.extensions["pw_pool"] = ThreadPoolExecutor(max_workers=os.cpu_count())
+    
+    # ensure that the instance folder exists, only touching the filesystem the first time per path
+    if app.instance_path not in _ready_instance_paths:
+        os.makedirs(app.instance_path, exist_ok=True)
+        _ready_instance_paths.add(app.instance_path)
     
     
     @app.route("/")
@@ -61,29 +69,33 @@ def create_app(test_config=None):
     
     
     # Files that provide the routes within the app
-    from . import auth
-    app.register_blueprint(auth.bp)
-        
-    
-    from . import location_routes
-    app.register_blueprint(location_routes.bp)
-    app.add_url_rule("/", endpoint="index")
-    
-    
-    from . import customer_routes
-    app.register_blueprint(customer_routes.bp)
-    app.add_url_rule("/", endpoint="index")
-    
-    
-    from . import supplier_routes
-    app.register_blueprint(supplier_routes.bp)
-    app.add_url_rule("/", endpoint="index")
+    register_blueprints(app)
   
   
     return app
 
 
-app = create_app()
+def register_blueprints(app):
+    """
+    Import the route modules and register their blueprints on the app.
+
+    The imports are deferred until the app is built, so importing the package (e.g. for
+    the db module alone) does not pull in the forms, route handlers and their dependencies.
+    For the same reason the app is not built at import time: the Flask CLI and gunicorn
+    call create_app() themselves.
+    The 'index' endpoint used by url_for() is registered once here rather than per blueprint.
+
+    Args:
+        app: Flask application instance.
+    """
+    
+    from . import auth, customer_routes, location_routes, supplier_routes
+    
+    for module in (auth, location_routes, customer_routes, supplier_routes):
+        app.register_blueprint(module.bp)
+        
+    app.add_url_rule("/", endpoint="index")
+
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000)
+    create_app().run(host='0.0.0.0', port=5000)
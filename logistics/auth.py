@@ -3,15 +3,24 @@ from functools import wraps
 from flask import (
     Blueprint, flash, g, redirect, render_template, request, session, url_for
 )
-from werkzeug.security import check_password_hash, generate_password_hash
 
 from logistics.db import get_db
 from logistics.forms import RegisterForm, LoginForm
+from logistics.security import needs_rehash, pwd_context, run_in_pool, verify_password
 
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
+SQL_INSERT_USER = "INSERT INTO user (email, password, company, user_type, full_name) VALUES (?, ?, ?, ?, ?)"
+
+SQL_GET_USER_BY_EMAIL = "SELECT id, password FROM user WHERE email = ?"
+
+SQL_UPDATE_PASSWORD = "UPDATE user SET password = ? WHERE id = ?"
+
+SQL_GET_USER_BY_ID = "SELECT id, company, user_type, full_name FROM user WHERE id = ?"
+
+
 @bp.route("/register", methods=("GET", "POST"))
 def register():
     """
@@ -27,7 +36,7 @@ def register():
 
     On form submission:
         - Validates the submitted form data (email, password, company, user_type, full_name).
-        - Hashes the password using generate_password_hash() for security.
+        - Hashes the password using bcrypt via pwd_context.hash() for security.
         - Inserts a new user record into the database.
         - Redirects to the 'auth.login' endpoint for user login.
 
@@ -61,10 +70,9 @@ def register():
         if error is None:
             try:
                 db.execute(
-                    "INSERT INTO user (email, password, company, user_type, full_name) VALUES (?, ?, ?, ?, ?)",
-                    (email, generate_password_hash(password), company, user_type, full_name),
+                    SQL_INSERT_USER,
+                    (email, run_in_pool(pwd_context.hash, password), company, user_type, full_name),
                 )
-                db.commit()
             except db.IntegrityError:
                 error = f"User {email} is already registered."
             else:
@@ -94,7 +102,8 @@ def login():
     On form submission:
         - Retrieves the submitted email and password from the login form.
         - Queries the database for a user record with the provided email.
-        - Checks if the user exists and verifies the password using check_password_hash().
+        - Checks if the user exists and verifies the password using verify_password().
+        - Re-hashes and stores the password if the stored hash is outdated (e.g. legacy pbkdf2).
         - Initiates a session by setting 'user_id' in the session object upon successful login.
         - Redirects to the 'index' endpoint after successful authentication.
 
@@ -110,16 +119,20 @@ def login():
         password = request.form["password"]
         db = get_db()
         error = None
-        user = db.execute(
-            "SELECT * FROM user WHERE email = ?", (email,)
-        ).fetchone()
+        user = db.execute(SQL_GET_USER_BY_EMAIL, (email,)).fetchone()
         
         if user is None:
             error = "Incorrect email."
-        elif not check_password_hash(user["password"], password):
+        elif not run_in_pool(verify_password, password, user["password"]):
             error = "Incorrect password."
             
         if error is None:
+            if needs_rehash(user["password"]):
+                db.execute(
+                    SQL_UPDATE_PASSWORD,
+                    (run_in_pool(pwd_context.hash, password), user["id"])
+                )
+                
             session.clear()
             session["user_id"] = user["id"]
             return redirect(url_for("index"))
@@ -145,16 +158,20 @@ def load_logged_in_user():
         - Sets 'g.user' to None.
 
     This function ensures that the logged-in user's information is available globally for each request.
+    Requests for static files skip the lookup entirely, as they never use 'g.user'.
+    Only the columns used by the routes and templates are selected, so the password hash is never loaded.
     """
     
+    if request.endpoint in (None, "static"):
+        g.user = None
+        return
+    
     user_id = session.get("user_id")
     
     if user_id is None:
         g.user = None
     else:
-        g.user = get_db().execute(
-            'SELECT * FROM user WHERE id = ?', (user_id,)
-        ).fetchone()
+        g.user = get_db().execute(SQL_GET_USER_BY_ID, (user_id,)).fetchone()
         
 
 @bp.route("/logout")
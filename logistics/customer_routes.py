@@ -6,47 +6,159 @@ from werkzeug.exceptions import abort
 from logistics.auth import customer_only
 from logistics.db import get_db
 from logistics.forms import RequestForm
+from logistics.views import paginate, stream_page
 
 
 bp = Blueprint("customer_routes", __name__)
 
 
+SQL_LIST_REQUESTS = """
+    SELECT 
+        id, 
+        collection_address, 
+        delivery_address, 
+        collection_date, 
+        delivery_date, 
+        request_status, 
+        pallets,
+        weight
+    FROM request
+    WHERE company = ?
+    ORDER BY created_date DESC, id DESC
+    LIMIT ? OFFSET ?
+"""
+
+SQL_INSERT_REQUEST = """
+    INSERT INTO request (created_by, collection_date, delivery_date, collection_address, delivery_address, pallets, weight, company)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_GET_REQUEST = """
+    SELECT 
+        r.id, 
+        collection_address, 
+        delivery_address, 
+        collection_date, 
+        delivery_date,
+        pallets,
+        weight,
+        request_status
+    FROM request AS r
+    WHERE r.id = ? AND r.company = ?
+"""
+
+SQL_GET_REQUEST_WITH_BIDS = """
+    SELECT 
+        r.id, 
+        r.collection_address, 
+        r.delivery_address, 
+        r.collection_date, 
+        r.delivery_date,
+        r.pallets,
+        r.weight,
+        r.request_status,
+        b.id AS bid_id,
+        b.bid_amount,
+        b.created_date,
+        b.bid_status,
+        u.company
+    FROM request AS r
+    LEFT JOIN bid b
+        ON b.request_id = r.id
+    LEFT JOIN user u
+        ON b.created_by = u.id
+    WHERE r.id = ? AND r.company = ?
+"""
+
+# Databases created before bid.request_id cascaded on delete still need the bids removed first
+SQL_DELETE_REQUEST_BIDS = """
+    DELETE FROM bid
+    WHERE request_id IN (
+        SELECT id FROM request
+        WHERE id = ? AND company = ? AND request_status <> 'Complete'
+    )
+"""
+
+SQL_DELETE_REQUEST = """
+    DELETE FROM request 
+    WHERE id = ? AND company = ? AND request_status <> 'Complete'
+    RETURNING id
+"""
+
+SQL_REQUEST_EXISTS = """
+    SELECT 1
+    FROM request
+    WHERE id = ? AND company = ?
+"""
+
+SQL_UPDATE_REQUEST = """
+    UPDATE request SET 
+        collection_address = ?, 
+        delivery_address = ?, 
+        collection_date = ?, 
+        delivery_date = ?,
+        pallets = ?,
+        weight = ?
+    WHERE id = ?
+"""
+
+SQL_GET_BID_REQUEST_ID = """
+    SELECT 
+        request_id 
+    FROM bid 
+    WHERE id = ? AND request_id IN (SELECT id FROM request WHERE company = ?)
+"""
+
+SQL_COMPLETE_REQUEST = """
+    UPDATE request SET request_status = 'Complete'
+    WHERE id = ?
+"""
+
+SQL_ACCEPT_BID = """
+    UPDATE bid SET bid_status = CASE WHEN id = ? THEN 'Accepted' ELSE 'Rejected' END
+    WHERE request_id = ?
+"""
+
+SQL_REJECT_BID = """
+    UPDATE bid SET bid_status = 'Rejected'
+    WHERE id = ? AND request_id IN (SELECT id FROM request WHERE company = ?)
+    RETURNING request_id
+"""
+
+SQL_REVERT_REQUEST_STATUS = """
+    UPDATE request SET request_status = 'Awaiting bids'
+    WHERE id = ? AND NOT EXISTS (
+        SELECT 1
+        FROM bid
+        WHERE request_id = ? AND bid_status <> 'Rejected'
+    )
+"""
+
+
 @bp.route("/customer-requests")
 @customer_only
 def customer_requests():
     """
-    Display a list of requests created by the current user's company.
+    Display a page of requests created by the current user's company.
 
-    This endpoint retrieves all requests associated with the company of the currently logged-in user 
-    and renders them in the 'customer_requests.html' template.
+    This endpoint retrieves one page of requests associated with the company of the currently logged-in user,
+    newest first, and renders them in the 'customer_requests.html' template. The page is selected with the
+    'page' query argument and its size is set by the PAGE_SIZE config value.
 
     Returns:
-        Response: Rendered template 'customer_requests.html' with the following context variables:
+        Response: Streamed template 'customer_requests.html' with the following context variables:
             - requests: A list of dictionaries, each containing the details of a request created by the current user's company. 
+            - page: The current page number.
+            - has_next: Whether there is a further page of requests.
     """
     
-    db = get_db()
-    requests = db.execute(
-        """
-        SELECT 
-            id, 
-            collection_address, 
-            delivery_address, 
-            collection_date, 
-            delivery_date, 
-            request_status, 
-            pallets,
-            weight,
-            company
-        FROM request
-        WHERE company = ?
-        ORDER BY created_date DESC
-        """, (g.user["company"],)
-    ).fetchall()
+    requests, page, has_next = paginate(SQL_LIST_REQUESTS, (g.user["company"],))
             
-    return render_template(
+    return stream_page(
         "/customer/requests/customer_requests.html",
-        requests=requests
+        requests=requests,
+        page=page,
+        has_next=has_next
     )
 
   
@@ -59,7 +171,8 @@ def create_request():
     This endpoint allows a customer to create a new request by filling out and submitting a form.
     It handles both the GET and POST methods:
     - GET: Renders the 'create_request.html' template with an empty RequestForm.
-    - POST: Processes the submitted form data, creates a new request record in the database, and redirects to the customer requests page.
+    - POST: Validates the submitted form data, creates a new request record in the database, and redirects to the customer requests page.
+      If validation fails, the form is rendered again with its errors.
 
     Returns:
         Response: 
@@ -71,29 +184,28 @@ def create_request():
     """
     
     form = RequestForm()
+    form.populate_choices()
     
-    if request.method == "POST":
+    if form.validate_on_submit():
         created_by = g.user["id"]
-        collection_date = form.collection_date.data.strftime("%Y-%m-%d %H:%M:%S")
-        delivery_date = form.delivery_date.data.strftime("%Y-%m-%d %H:%M:%S")
+        collection_date = form.collection_date.data
+        delivery_date = form.delivery_date.data
         collection_address = form.collection_address.data
         delivery_address = form.delivery_address.data
         pallets = form.pallets.data
         weight = form.weight.data
         company = g.user["company"]
 
+        db = get_db()
+        
         try:
-            db = get_db()
-            db.execute(
-                """
-                INSERT INTO request (created_by, collection_date, delivery_date, collection_address, delivery_address, pallets, weight, company)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (created_by, collection_date, delivery_date, collection_address, delivery_address, pallets, weight, company)
-            )
-            db.commit()
+            with db:
+                db.execute(
+                    SQL_INSERT_REQUEST,
+                    (created_by, collection_date, delivery_date, collection_address, delivery_address, pallets, weight, company)
+                )
             return redirect(url_for("customer_routes.customer_requests"))
         except Exception as e:
-            db.rollback()
             flash(f"An error occurred while creating the request: {str(e)}", "error")
         
     return render_template(
@@ -106,6 +218,7 @@ def customer_get_request(id):
     Retrieve a specific customer request by its ID.
 
     This helper function queries the database to fetch the details of a customer request identified by the given ID.
+    Only requests belonging to the current user's company are returned.
     If the request is not found, it aborts with a 404 error.
 
     Parameters:
@@ -115,25 +228,11 @@ def customer_get_request(id):
         dict: A dictionary containing the details of the specified customer request. 
         
     Raises:
-        404: If the request is not found for the specified ID.
+        404: If the request is not found for the specified ID, or belongs to another company.
     """
     
     db = get_db()
-    request = db.execute(
-        """
-        SELECT 
-            r.id, 
-            collection_address, 
-            delivery_address, 
-            collection_date, 
-            delivery_date,
-            pallets,
-            weight,
-            request_status
-        FROM request AS r
-        WHERE r.id = ?
-        """, (id,)
-    ).fetchone()
+    request = db.execute(SQL_GET_REQUEST, (id, g.user["company"])).fetchone()
         
     if request is None:
         abort(404, f"Request id {id} doesn't exist.")
@@ -141,43 +240,36 @@ def customer_get_request(id):
     return request
 
 
-def customer_get_bids(id):
+def customer_get_request_with_bids(id):
     """
-    Retrieve all bids associated with a specific customer request.
+    Retrieve a specific customer request along with all bids associated with it.
 
-    This helper function queries the database to fetch all bids related to the given request ID.
-    If no bids are found, it aborts with a 404 error.
+    This helper function fetches the request and its bids in a single query by joining the bids onto the request.
+    Each returned row holds the request details plus one bid, or NULL bid columns if the request has no bids.
+    Only requests belonging to the current user's company are returned.
+    If the request is not found, it aborts with a 404 error.
 
     Parameters:
-        id (int): The ID of the customer request for which bids are to be retrieved.
+        id (int): The ID of the customer request to be retrieved.
 
     Returns:
-        list: A list of dictionaries, each containing the details of a bid associated with the specified request. 
+        tuple: A tuple containing:
+            - request: A dictionary containing the details of the specified customer request.
+            - bids: A list of dictionaries, each containing the details of a bid associated with the specified request.
 
     Raises:
-        404: If no bids are found for the specified request ID.
+        404: If the request is not found for the specified ID, or belongs to another company.
     """
     
     db = get_db()
-    bids_received = db.execute(
-        """
-        SELECT
-            b.id AS bid_id,
-            b.bid_amount,
-            b.created_date,
-            b.bid_status,
-            u.company
-        FROM bid b
-        LEFT JOIN user u
-            ON b.created_by = u.id
-        WHERE b.request_id = ?
-        """, (id,)
-    ).fetchall()
+    rows = db.execute(SQL_GET_REQUEST_WITH_BIDS, (id, g.user["company"])).fetchall()
     
-    if bids_received is None:
+    if not rows:
         abort(404, f"Request id {id} doesn't exist.")
+        
+    bids_received = [row for row in rows if row["bid_id"] is not None]
     
-    return bids_received
+    return rows[0], bids_received
     
 
 @bp.route("/<int:id>/customer-request", methods=("GET", "POST"))
@@ -187,8 +279,8 @@ def view_request(id):
     Retrieve and display a customer request along with its associated bids.
 
     This endpoint handles GET and POST requests to display a specific customer request and all bids made against it.
-    It fetches the request details and the associated bids from the database and renders them using the 
-    'customer_request.html' template.
+    It fetches the request details and the associated bids from the database in a single query and renders them
+    using the 'customer_request.html' template.
 
     Parameters:
         id (int): The ID of the customer request to be retrieved and displayed.
@@ -200,8 +292,7 @@ def view_request(id):
     """
     
     try:
-        request = customer_get_request(id)
-        bids = customer_get_bids(id)
+        request, bids = customer_get_request_with_bids(id)
     except Exception as e:
         flash(f"An error occurred: {str(e)}", "error")
         return redirect(url_for("customer_routes.customer_requests"))
@@ -219,7 +310,8 @@ def remove_request(id):
     """
     Handle the removal of a customer request.
 
-    This route allows a customer to remove a request specified by the ID if the request is not already complete.
+    This route allows a customer to remove a request specified by the ID if the request belongs to their company
+    and is not already complete.
     If the request is complete, it cannot be removed and an error message is generated.
 
     Parameters:
@@ -227,43 +319,36 @@ def remove_request(id):
 
     Returns:
         Response: A redirection to the customer requests page if the request is successfully removed.
-        If the request is complete, it does not redirect and an error message is generated.
+        If the request is complete, it redirects back to the request page and an error message is generated.
     """
     
+    user_company = g.user["company"]
     db = get_db()
-    error = None
-    request_status = db.execute(
-        """
-        SELECT 
-            request_status
-        FROM request
-        WHERE id = ?
-        """, (id,)
-    ).fetchone()
     
-    if request_status is None:
-        error = "Request does not exist. No request to remove."
-        flash(error,"error")
+    try:
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            # Only deletes the request and its bids if it isn't complete, removing the need for a separate status check
+            db.execute(SQL_DELETE_REQUEST_BIDS, (id, user_company))
+            removed_request = db.execute(SQL_DELETE_REQUEST, (id, user_company)).fetchone()
+    except Exception as e:
+        flash(f"An error has occurred while attempting to delete the request: {str(e)}", "error")
         return redirect(url_for("customer_routes.customer_requests"))
-    elif request_status and request_status[0] == "Complete":
-        error = "Request is complete. Unable to remove."
-        flash(error, "error")
-    else:
-        try:
-            db.execute(
-                """
-                DELETE FROM request 
-                WHERE id = ?
-                """, (id, )
-                )
-            db.commit()
-            flash("Request deleted successfully.", "success")
-        except Exception as e:
-            db.rollback()
-            flash(f"An error has occurred while attempting to delete the request: {str(e)}", "error")
-        
+    
+    if removed_request is not None:
+        flash("Request deleted successfully.", "success")
+        return redirect(url_for("customer_routes.customer_requests"))
+    
+    # Nothing was deleted, so check whether the request exists to report the right error
+    request_exists = db.execute(SQL_REQUEST_EXISTS, (id, user_company)).fetchone()
+    
+    if request_exists is None:
+        flash("Request does not exist. No request to remove.", "error")
         return redirect(url_for("customer_routes.customer_requests"))
     
+    flash("Request is complete. Unable to remove.", "error")
+    return redirect(url_for("customer_routes.view_request", id=id))
+    
 
 @bp.route("/<int:id>/update-request", methods=("GET", "POST"))
 @customer_only
@@ -274,7 +359,8 @@ def update_request(id):
     This endpoint allows a customer to update an existing request by filling out and submitting a form.
     It handles both the GET and POST methods:
     - GET: Pre-fills the form with the current details of the request and renders the 'update_request.html' template.
-    - POST: Processes the submitted form data, updates the request record in the database, and redirects to the view request page.
+    - POST: Validates the submitted form data, updates the request record in the database, and redirects to the view request page.
+      If validation fails, the form is rendered again with its errors.
 
     Parameters:
         id (int): The ID of the customer request to be updated.
@@ -290,37 +376,31 @@ def update_request(id):
     
     this_request = customer_get_request(id)
     
-    form = RequestForm(data=this_request)
+    # Only pre-fill from the database on GET, as submitted data takes precedence on POST
+    form = RequestForm(data=this_request if request.method == "GET" else None)
+    form.populate_choices()
     form.submit.label.text = "Update"
     
-    if request.method == "POST":
-        collection_date = form.collection_date.data.strftime("%Y-%m-%d %H:%M:%S")
-        delivery_date = form.delivery_date.data.strftime("%Y-%m-%d %H:%M:%S")
+    if form.validate_on_submit():
+        collection_date = form.collection_date.data
+        delivery_date = form.delivery_date.data
         collection_address = form.collection_address.data
         delivery_address = form.delivery_address.data
         pallets = form.pallets.data
         weight = form.weight.data
 
+        db = get_db()
+        
         try:
-            db = get_db()
-            db.execute(
-                """
-                UPDATE request SET 
-                    collection_address = ?, 
-                    delivery_address = ?, 
-                    collection_date = ?, 
-                    delivery_date = ?,
-                    pallets = ?,
-                    weight = ?
-                WHERE id = ?
-                """, (collection_address, delivery_address, collection_date, delivery_date, pallets, weight, this_request[0])
-            )
-            db.commit()
+            with db:
+                db.execute(
+                    SQL_UPDATE_REQUEST,
+                    (collection_address, delivery_address, collection_date, delivery_date, pallets, weight, this_request["id"])
+                )
             flash("Request updated successfully.", "success")
             
             return redirect(url_for("customer_routes.view_request", id=id))
         except Exception as e:
-            db.rollback()
             flash(f"An error has occurred while attempting to update the request: {str(e)}", "error")
     
     return render_template(
@@ -337,57 +417,38 @@ def accept_bid(bid_id):
 
     This endpoint allows a customer to accept a bid by its ID. Upon acceptance:
     - Updates the request associated with the bid to 'Complete' status.
-    - Updates the accepted bid to 'Accepted' status.
-    - Updates all other bids for the same request to 'Rejected' status, except the accepted bid.
+    - Updates the accepted bid to 'Accepted' status and all other bids for the same request
+      to 'Rejected' status in a single statement.
 
     Parameters:
         bid_id (int): The ID of the bid to be accepted.
 
     Returns:
         Response: Redirects to the 'view_request' page for the request associated with the accepted bid.
+
+    Raises:
+        404 Error: If no bid with the specified ID exists on a request belonging to the current user's company.
     """
     
     db = get_db()
     
-    request_id = db.execute(
-        """
-        SELECT 
-            request_id 
-        FROM bid 
-        WHERE id = ?
-        """, (bid_id,)
-    ).fetchone()
+    request_id = db.execute(SQL_GET_BID_REQUEST_ID, (bid_id, g.user["company"])).fetchone()
     
-    if request_id:
-        request_id = request_id[0]
+    if request_id is None:
+        abort(404, f"Bid id {bid_id} doesn't exist.")
         
-        try:
-            db.execute(
-                """
-                UPDATE request SET request_status = 'Complete'
-                WHERE id = ?
-                """, (request_id,)
-            )
-            
-            db.execute(
-                """
-                UPDATE bid SET bid_status = 'Accepted'
-                WHERE id = ?
-                """, (bid_id,)
-            )
-            
-            db.execute(
-                """
-                UPDATE bid SET bid_status = 'Rejected'
-                WHERE request_id = ? AND id is not ?
-                """, (request_id, bid_id)
-            )
+    request_id = request_id["request_id"]
+    
+    try:
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(SQL_COMPLETE_REQUEST, (request_id,))
             
-            db.commit()
-            return redirect(url_for("customer_routes.view_request", id=request_id))
-        except Exception as e:
-            db.rollback()
-            flash(f"An error has occurred while accepting the request: {str(e)}", "error")
+            db.execute(SQL_ACCEPT_BID, (bid_id, request_id))
+    except Exception as e:
+        flash(f"An error has occurred while accepting the request: {str(e)}", "error")
+        
+    return redirect(url_for("customer_routes.view_request", id=request_id))
             
 
 @bp.route("/<int:bid_id>/reject", methods=("GET", "POST"))
@@ -398,56 +459,36 @@ def reject_bid(bid_id):
 
     This endpoint allows a customer to reject a bid by its ID. Upon rejection:
     - Updates the status of the bid to 'Rejected'.
+    - Updates the request associated with the bid to 'Awaiting bids' status if all of its bids are now rejected.
 
     Parameters:
         bid_id (int): The ID of the bid to be rejected.
 
     Returns:
         Response: Redirects to the 'view_request' page for the request associated with the rejected bid.
+        If the bid could not be rejected, it redirects to the customer requests page and an error message is generated.
+
+    Raises:
+        404 Error: If no bid with the specified ID exists on a request belonging to the current user's company.
     """
     
     db = get_db()
     
-    request_id = db.execute(
-        """
-        SELECT 
-            request_id 
-        FROM bid 
-        WHERE id = ?
-        """, (bid_id,)
-    ).fetchone()
-    
-    number_of_bids = db.execute(
-        """
-        SELECT
-            COUNT(request_id) AS count
-        FROM bid
-        WHERE bid_status is not 'Rejected' AND request_id = ?
-        """, (request_id[0],)
-    ).fetchone()
-    
-    try:  
-        if request_id:
-            request_id = request_id[0]
-                    
-            db.execute(
-                """
-                UPDATE bid SET bid_status = 'Rejected'
-                WHERE id = ?
-                """, (bid_id,)
-            )
-            
-        if number_of_bids["count"] == 1:            
-            db.execute(
-                """
-                UPDATE request SET request_status = "Awaiting bids"
-                WHERE id = ?
-                """, (request_id,)
-            )
+    try:
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            # RETURNING gives the bid's request id from the same statement that rejects it
+            rejected_bid = db.execute(SQL_REJECT_BID, (bid_id, g.user["company"])).fetchone()
             
-        db.commit()
-        return redirect(url_for("customer_routes.view_request", id=request_id))
+            if rejected_bid is not None:
+                request_id = rejected_bid["request_id"]
+                # Only reverts the request status once no bids remain that haven't been rejected
+                db.execute(SQL_REVERT_REQUEST_STATUS, (request_id, request_id))
     except Exception as e:
-        db.rollback()
         flash(f"An error has occurred while attempting to reject the request: {str(e)}", "error")
-          
\ No newline at end of file
+        return redirect(url_for("customer_routes.customer_requests"))
+    
+    if rejected_bid is None:
+        abort(404, f"Bid id {bid_id} doesn't exist.")
+        
+    return redirect(url_for("customer_routes.view_request", id=request_id))
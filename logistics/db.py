@@ -1,45 +1,120 @@
 import sqlite3
+import threading
+from datetime import date
 
 import click
 from flask import current_app, g
+from flask.cli import with_appcontext
 
 
-def get_db():
+def adapt_date(value):
+    """
+    Convert a date into the 'YYYY-MM-DD HH:MM:SS' text stored in TIMESTAMP columns.
+
+    Registered as the sqlite3 adapter for date, so dates from forms can be passed straight
+    to db.execute(). The time part is required for PARSE_DECLTYPES to read the value back
+    as a datetime.
+
+    Args:
+        value (date): The date to convert.
+
+    Returns:
+        str: The date formatted as a timestamp at midnight.
     """
-    Return a SQLite database connection stored in the Flask application context.
 
-    If the connection does not exist in the global 'g' object, it creates a new connection 
-    using the database path specified in the current Flask application's configuration.
+    return value.isoformat() + " 00:00:00"
+
+
+sqlite3.register_adapter(date, adapt_date)
+
+
+# One open connection per worker thread and database path, reused across requests
+_local = threading.local()
+
+
+def _connect(database):
+    """
+    Open a new SQLite database connection and apply the connection-scoped settings.
+
     Sets row_factory to sqlite3.Row for returning rows as dictionaries.
+    Opens the connection in autocommit mode (isolation_level=None), so single statements commit
+    on their own and routes that write several statements open a transaction explicitly with
+    "BEGIN IMMEDIATE".
+    Keeps up to 256 prepared statements cached, so the module-level SQL constants used by the
+    routes are only parsed once per connection.
+    Applies connection-scoped PRAGMAs (WAL journaling, relaxed syncing, a larger page cache,
+    memory-mapped reads, a busy timeout and foreign key enforcement) once when the connection
+    is opened.
+
+    Args:
+        database (str): Path to the SQLite database file.
+
+    Returns:
+        sqlite3.Connection: SQLite database connection.
+    """
+
+    db = sqlite3.connect(
+        database,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level=None,
+        cached_statements=256
+    )
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA busy_timeout=5000")
+    db.execute("PRAGMA cache_size=-32000")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA mmap_size=134217728")
+    db.execute("PRAGMA foreign_keys=ON")
+
+    return db
+
+
+def get_db():
+    """
+    Return a SQLite database connection for the current request.
+
+    Connections are held open per worker thread (one for each database path) and reused
+    across requests, so the connect and PRAGMA setup cost is only paid once per thread.
+    The connection in use is also stored in the global 'g' object so that close_db() can
+    release it when the application context is torn down.
 
     Returns:
         sqlite3.Connection: SQLite database connection.
     """
     
     if "db" not in g:
-        g.db = sqlite3.connect(
-            current_app.config["DATABASE"],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        database = current_app.config["DATABASE"]
+        connections = getattr(_local, "connections", None)
+        
+        if connections is None:
+            connections = _local.connections = {}
+        
+        if database not in connections:
+            connections[database] = _connect(database)
+            
+        g.db = connections[database]
     
     return g.db
 
 
 def close_db(e=None):
     """
-    Close the SQLite database connection stored in the Flask application context.
+    Release the SQLite database connection used by the Flask application context.
 
     Args:
         e: Optional exception information.
 
-    Closes the database connection stored in the global 'g' object if it exists.
+    The connection itself stays open for reuse by the next request on this thread.
+    Any transaction left open by the request (e.g. after an unhandled error) is rolled back
+    so that the next request starts from a clean state.
     """
 
     db = g.pop("db", None)
     
-    if db is not None:
-        db.close()
+    if db is not None and db.in_transaction:
+        db.rollback()
         
         
 def init_db():
@@ -55,8 +130,25 @@ def init_db():
     with current_app.open_resource("schema.sql") as f:
         db.executescript(f.read().decode("utf8"))
         
+    upgrade_db()
+        
+
+def upgrade_db():
+    """
+    Bring an existing database up to date without clearing its data.
+
+    Reads and executes the SQL commands from 'indexes.sql'. Each index is only created if it
+    does not already exist, so this is safe to run against a database on every deploy.
+    """
+    
+    db = get_db()
+    
+    with current_app.open_resource("indexes.sql") as f:
+        db.executescript(f.read().decode("utf8"))
+        
         
 @click.command("init-db")
+@with_appcontext
 def init_db_command():
     """
     Flask CLI command to initialize the database.
@@ -69,16 +161,32 @@ def init_db_command():
     click.echo("Initialized the database")
     
 
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db_command():
+    """
+    Flask CLI command to upgrade an existing database.
+
+    Adds any missing indexes by calling the upgrade_db() function, keeping existing data.
+    Outputs a message confirming the upgrade.
+    """
+
+    upgrade_db()
+    click.echo("Upgraded the database")
+    
+
 def init_app(app):
     """
     Initialize the Flask application with database-related functionality.
 
     Registers the close_db() function to be called when the application context is torn down.
-    Adds the init_db_command() as a CLI command to the Flask application for database initialization.
+    Adds the init_db_command() and upgrade_db_command() as CLI commands to the Flask application for
+    database initialization and upgrades.
 
     Args:
         app: Flask application instance.
     """
     
     app.teardown_appcontext(close_db)
-    app.cli.add_command(init_db_command)
\ No newline at end of file
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(upgrade_db_command)
\ No newline at end of file
@@ -4,20 +4,13 @@ from flask import g
 from flask_wtf import FlaskForm
 
 from wtforms import StringField, SelectField, DateField, SubmitField, PasswordField, IntegerField
-from wtforms.validators import DataRequired, NumberRange, ValidationError
+from wtforms.validators import DataRequired, InputRequired, NumberRange
 
 from logistics.db import get_db
 
-# Custom validators
-def validate_collectionBy(form, field):
-    today = date.today()
-    print(field.data)
-    if field.data < today:
-        raise ValidationError("The must be in the future")
-    
-def validate_deliveryBy(form, field):
-    if field.data <= form.collection_date.data:
-        raise ValidationError("The delivery date must not be prior to the collection date")
+
+# Pallet counts offered on request forms, built once rather than per form
+_PALLET_CHOICES = tuple((str(i), str(i)) for i in range(1, 11))
 
 
 # Flask forms
@@ -37,26 +30,60 @@ class LoginForm(FlaskForm):
 class RequestForm(FlaskForm):
     collection_address = SelectField("Collection Address", validators=[DataRequired()])
     delivery_address = SelectField("Delivery Address", validators=[DataRequired()])
-    pallets = SelectField("Pallets", validators=[DataRequired()], choices=(range(1,11)))
+    pallets = SelectField("Pallets", validators=[DataRequired()], choices=_PALLET_CHOICES, coerce=int)
     weight = IntegerField("Weight (kg)", validators=[DataRequired(), NumberRange(min=1, max=10000)])
-    collection_date = DateField("Collection Date", format="%Y-%m-%d", validators=[DataRequired(), validate_collectionBy])
-    delivery_date = DateField("Delivery Date", format="%Y-%m-%d", validators=[DataRequired(), validate_deliveryBy])
+    collection_date = DateField("Collection Date", format="%Y-%m-%d", validators=[InputRequired()])
+    delivery_date = DateField("Delivery Date", format="%Y-%m-%d", validators=[InputRequired()])
     submit = SubmitField("Create Request")
     
-    def __init__(self, *args, **kwargs):
-        super(RequestForm, self).__init__(*args, **kwargs)
-        db = get_db()
-        query = db.execute(
-            """
-            SELECT name || ', ' || street || ', ' || city || ', ' || country || ', ' || zipcode AS full_address
-            FROM location l
-            LEFT JOIN user u 
-                ON u.id = l.created_by
-            WHERE u.company = ?
-            ORDER BY l.id
-            """, (g.user["company"],)
-        ).fetchall()
-        all_locations = [(row["full_address"], row["full_address"]) for row in query]
+    def validate(self, extra_validators=None):
+        """
+        Validate the form, then check the collection and delivery dates against each other and today.
+
+        The collection date must not be in the past and the delivery date must be after the collection
+        date. A date that failed to parse is None and has already been reported, so it is not compared.
+
+        Returns:
+            bool: True if the form and the dates are valid, otherwise False.
+        """
+        
+        valid = super().validate(extra_validators)
+        collection_date = self.collection_date.data
+        delivery_date = self.delivery_date.data
+        
+        if collection_date is not None and collection_date < date.today():
+            self.collection_date.errors.append("The collection date must not be in the past")
+            valid = False
+            
+        if None not in (collection_date, delivery_date) and delivery_date <= collection_date:
+            self.delivery_date.errors.append("The delivery date must not be prior to the collection date")
+            valid = False
+            
+        return valid
+    
+    def populate_choices(self):
+        """
+        Load the current user's company locations as the address choices.
+
+        Called by the routes before validating or rendering the form: the SelectFields need their
+        choices both to render and to check a submitted address belongs to the company.
+        Address choices are cached on g so they are only queried once per request.
+        """
+        
+        all_locations = g.get("address_choices")
+        if all_locations is None:
+            db = get_db()
+            query = db.execute(
+                """
+                SELECT name, street, city, country, zipcode
+                FROM location l
+                JOIN user u
+                    ON u.id = l.created_by AND u.company = ?
+                ORDER BY l.id
+                """, (g.user["company"],)
+            ).fetchall()
+            full_addresses = [", ".join(row) for row in query]
+            all_locations = g.address_choices = [(address, address) for address in full_addresses]
         self.collection_address.choices = all_locations
         self.delivery_address.choices = all_locations
             
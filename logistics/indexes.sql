@@ -0,0 +1,6 @@
+CREATE INDEX IF NOT EXISTS idx_bid_request_status ON bid(request_id, bid_status);
+CREATE INDEX IF NOT EXISTS idx_request_company_created ON request(company, created_date DESC);
+CREATE INDEX IF NOT EXISTS idx_location_created_by ON location(created_by);
+CREATE INDEX IF NOT EXISTS idx_bid_created_by ON bid(created_by);
+CREATE INDEX IF NOT EXISTS idx_user_company ON user(company);
+CREATE INDEX IF NOT EXISTS idx_request_status ON request(request_status);
@@ -1,52 +1,114 @@
+import sqlite3
+
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, current_app, flash, g, redirect, render_template, request, url_for
 )
 from werkzeug.exceptions import abort
 
 from logistics.auth import customer_only
 from logistics.db import get_db
 from logistics.forms import LocationForm
+from logistics.views import MSG_DATABASE_BUSY, paginate, stream_page
 
 
 bp = Blueprint("location_routes", __name__)
 
 
+SQL_LIST_LOCATIONS = """
+    SELECT 
+        l.id, 
+        name, 
+        street, 
+        city, 
+        country, 
+        zipcode
+    FROM location l
+    JOIN user u
+        ON u.id = l.created_by AND u.company = ?
+    ORDER BY l.id
+    LIMIT ? OFFSET ?
+"""
+
+# Locations listed before this one for the company, to find the page of the list it appears on
+SQL_COUNT_LOCATIONS_BEFORE = """
+    SELECT 
+        COUNT(*)
+    FROM location l
+    JOIN user u
+        ON u.id = l.created_by AND u.company = ?
+    WHERE l.id < ?
+"""
+
+SQL_GET_LOCATION = """
+    SELECT 
+        created_by, 
+        name, 
+        street, 
+        city, 
+        country, 
+        zipcode
+    FROM location l
+    WHERE l.id = ?
+"""
+
+SQL_GET_LOCATION_OWNER = """
+    SELECT 
+        created_by
+    FROM location
+    WHERE id = ?
+"""
+
+SQL_INSERT_LOCATION = """
+    INSERT INTO location (created_by, name, street, city, country, zipcode)
+    VALUES (?, ?, ?, ?, ?, ?)
+    RETURNING id
+"""
+
+# Only matches the row if a value differs, so saving an unchanged form does not rewrite the page
+SQL_UPDATE_LOCATION = """
+    UPDATE location SET name = :name, street = :street, city = :city, country = :country, zipcode = :zipcode
+    WHERE id = :id
+    AND (
+        name IS NOT :name
+        OR street IS NOT :street
+        OR city IS NOT :city
+        OR country IS NOT :country
+        OR zipcode IS NOT :zipcode
+    )
+"""
+
+SQL_DELETE_LOCATION = "DELETE FROM location WHERE id = ?"
+
+
 @bp.route("/manage-locations", methods=("GET", "POST"))
 @customer_only
 def manage_locations():
     """
     Handle requests to the /manage-locations endpoint for managing customer locations.
 
-    Retrieves and displays all locations created by the current user's company from the database.
-    Displays a list of locations with details including ID, name, street, city, country, zipcode, 
-    and the company that created each location.
+    Retrieves and displays one page of locations created by the current user's company from the database,
+    selected with the 'page' query argument.
+    Displays a list of locations with details including ID, name, street, city, country and zipcode.
+
+    If the 'highlight' query argument is given (e.g. after creating or updating a location), that
+    location's row is highlighted in the list.
 
     Returns:
-        Response: Rendered template 'manage_locations.html' with the following context variable:
+        Response: Streamed template 'manage_locations.html' with the following context variables:
             - locations: A list of dictionaries representing locations, each containing:
+            - page: The current page number.
+            - has_next: Whether there is a further page of locations.
+            - highlight: The ID of the location to highlight, or None.
     """
     
-    db = get_db()
-    locations = db.execute(
-        """
-        SELECT 
-            l.id, 
-            name, 
-            street, 
-            city, 
-            country, 
-            zipcode,
-            u.company
-        FROM location l
-        LEFT JOIN user u 
-            ON u.id = l.created_by
-        WHERE u.company = ?
-        """, (g.user["company"],)
-    ).fetchall()
+    locations, page, has_next = paginate(SQL_LIST_LOCATIONS, (g.user["company"],))
         
-    return render_template(
+    return stream_page(
         "/customer/locations/manage_locations.html",
-        locations=locations
+        locations=locations,
+        page=page,
+        has_next=has_next,
+        highlight=request.args.get("highlight", type=int)
     )
 
 
@@ -64,31 +126,26 @@ def create_location():
         Response: Rendered template 'create_location.html' with the following context variable:
             - form: An instance of LocationForm used for creating a new location.
 
-    On successful form submission:
+    On successful form submission (validated with validate_on_submit()):
         - Inserts a new record into the 'location' table with details provided by the user.
-        - Redirects the user to the 'manage_locations' endpoint to view the updated list of locations.
+        - Redirects the user to the 'manage_locations' endpoint to view the updated list of locations,
+          on the page with the new location highlighted.
     """
     
     form = LocationForm()
-    if request.method == "POST":
+    if form.validate_on_submit():
         created_by = g.user["id"]
         name = form.name.data
         street = form.street.data
         city = form.city.data
         country = form.country.data
         zipcode = form.zipcode.data
-        error = None
     
-        if error is not None:
-            flash(error)
-        else:
-            db = get_db()
-            db.execute(
-                'INSERT INTO location (created_by, name, street, city, country, zipcode)'
-                ' VALUES (?, ?, ?, ?, ?, ?)',
-                (created_by, name, street, city, country, zipcode))
-            db.commit()
-            return redirect(url_for("location_routes.manage_locations"))
+        db = get_db()
+        location = db.execute(
+            SQL_INSERT_LOCATION,
+            (created_by, name, street, city, country, zipcode)).fetchone()
+        return redirect(location_list_url(location["id"]))
         
     return render_template(
         "/customer/locations/create_location.html",
@@ -96,7 +153,26 @@ def create_location():
     )
     
 
-def get_location(id, check_created_by=True):
+def location_list_url(id):
+    """
+    Build the URL of the manage locations page that shows a location, with that location highlighted.
+
+    The list is ordered by ID, so the page is found by counting the company's locations with a lower ID.
+
+    Args:
+        id (int): The ID of the location to highlight.
+
+    Returns:
+        str: The URL of the 'manage_locations' endpoint for the page holding the location.
+    """
+    
+    locations_before = get_db().execute(SQL_COUNT_LOCATIONS_BEFORE, (g.user["company"], id)).fetchone()[0]
+    page = locations_before // current_app.config["PAGE_SIZE"] + 1
+    
+    return url_for("location_routes.manage_locations", page=page, highlight=id)
+
+
+def get_location(id, check_created_by=True, query=SQL_GET_LOCATION):
     """
     Retrieve a location from the database by its ID.
 
@@ -104,9 +180,13 @@ def get_location(id, check_created_by=True):
         id (int): The ID of the location to retrieve.
         check_created_by (bool, optional): Whether to check if the current user created the location.
             Defaults to True.
+        query (str, optional): The query used to load the location, which must select created_by.
+            Defaults to SQL_GET_LOCATION. Pass SQL_GET_LOCATION_OWNER when only the ownership check
+            is needed, so the location's details aren't loaded.
 
     Returns:
         dict: A dictionary representing the location with the following keys:
+            created_by, name, street, city, country, zipcode (only created_by with SQL_GET_LOCATION_OWNER)
 
     Raises:
         404 Error: If no location with the specified ID exists in the database.
@@ -114,21 +194,7 @@ def get_location(id, check_created_by=True):
     """
     
     db = get_db()
-    location = db.execute(
-        """
-        SELECT 
-            l.id, 
-            created_by, 
-            name, 
-            street, 
-            city, 
-            country, 
-            zipcode, 
-            created_date
-        FROM location l
-        WHERE l.id = ?
-        """, (id,)
-    ).fetchone()
+    location = db.execute(query, (id,)).fetchone()
     
     if location is None:
         abort(404, f"Location id {id} does not exist.")
@@ -137,17 +203,19 @@ def get_location(id, check_created_by=True):
         abort(403)
         
     return location
-    
-    
+
+
 @bp.route("/<int:id>/update-location", methods=("GET", "POST"))
 @customer_only
 def update_location(id):
     """
     Handle requests to the /<int:id>/update-location endpoint for updating a customer location.
 
-    Retrieves the location with the specified ID from the database using get_location().
-    Pre-fills a form with existing location details for editing.
-    On form submission, updates the location record in the database with new details.
+    On GET, retrieves the location with the specified ID from the database using get_location()
+    and pre-fills a form with existing location details for editing.
+    On POST, only checks ownership of the location using get_location() with SQL_GET_LOCATION_OWNER.
+    On form submission, updates the location record in the database with new details. The update is
+    skipped by SQLite if none of the details have changed.
 
     Args:
         id (int): The ID of the location to update.
@@ -156,34 +224,36 @@ def update_location(id):
         Response: Rendered template 'update_location.html' with the following context variable:
             - form: An instance of LocationForm pre-filled with location details for editing.
 
-    On successful form submission:
-        - Updates the corresponding record in the 'location' table with edited details.
-        - Redirects the user to the 'manage_locations' endpoint to view the updated list of locations.
+    On successful form submission (validated with validate_on_submit()):
+        - Updates the corresponding record in the 'location' table with edited details, if any changed.
+        - Redirects the user to the 'manage_locations' endpoint to view the updated list of locations,
+          on the page with the updated location highlighted.
     """
     
-    location = get_location(id)
-    
-    form = LocationForm(data=location)
+    if request.method == "GET":
+        form = LocationForm(data=get_location(id))
+    else:
+        get_location(id, query=SQL_GET_LOCATION_OWNER)
+        form = LocationForm()
     form.submit.label.text = "Update"
     
-    if request.method == "POST":
-        name = form.name.data
-        street = form.street.data
-        city = form.city.data
-        country = form.country.data
-        zipcode = form.zipcode.data
+    if form.validate_on_submit():
+        location = {
+            "id": id,
+            "name": form.name.data,
+            "street": form.street.data,
+            "city": form.city.data,
+            "country": form.country.data,
+            "zipcode": form.zipcode.data
+        }
 
         try:
             db = get_db()
-            db.execute(
-                'UPDATE location SET name = ?, street = ?, city = ?, country = ?, zipcode = ?'
-                ' WHERE id = ?',
-                (name, street, city, country, zipcode, id))
-            db.commit()
-            return redirect(url_for("location_routes.manage_locations"))
-        except Exception as e:
-            db.rollback()
-            flash(f"An error occured while creating the location: {str(e)}", "error")
+            db.execute(SQL_UPDATE_LOCATION, location)
+            return redirect(location_list_url(id))
+        except sqlite3.OperationalError:
+            current_app.logger.exception("Failed to update location %s", id)
+            flash(MSG_DATABASE_BUSY, "error")
 
     return render_template(
         "customer/locations/update_location.html",
@@ -197,7 +267,8 @@ def delete_location(id):
     """
     Handle requests to the /<int:id>/delete-location endpoint for deleting a customer location.
 
-    Retrieves the location with the specified ID from the database using get_location().
+    Checks the location with the specified ID exists and is owned by the current user using get_location()
+    with SQL_GET_LOCATION_OWNER.
     Deletes the location record from the database upon confirmation.
 
     Args:
@@ -207,14 +278,13 @@ def delete_location(id):
         Response: Redirects to the 'manage_locations' endpoint after successfully deleting the location.
     """
     
-    if get_location(id) is not None:    
-        db = get_db()
-        
-        try:
-            db.execute("DELETE FROM location WHERE id = ?", (id,))
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            flash(f"An error has occurred while attempting to delete the location: {str(e)}", "error")
+    get_location(id, query=SQL_GET_LOCATION_OWNER)
+    db = get_db()
+    
+    try:
+        db.execute(SQL_DELETE_LOCATION, (id,))
+    except sqlite3.OperationalError:
+        current_app.logger.exception("Failed to delete location %s", id)
+        flash(MSG_DATABASE_BUSY, "error")
             
     return redirect(url_for("location_routes.manage_locations"))
\ No newline at end of file
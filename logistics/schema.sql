@@ -1,7 +1,7 @@
-DROP TABLE IF EXISTS user;
-DROP TABLE IF EXISTS request;
 DROP TABLE IF EXISTS bid;
+DROP TABLE IF EXISTS request;
 DROP TABLE IF EXISTS location;
+DROP TABLE IF EXISTS user;
 
 CREATE TABLE user (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -35,7 +35,7 @@ CREATE TABLE bid (
     bid_amount INTEGER NOT NULL,
     bid_status INTEGER NOT NULL DEFAULT "Awaiting response",
     created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (request_id) REFERENCES request (id),
+    FOREIGN KEY (request_id) REFERENCES request (id) ON DELETE CASCADE,
     FOREIGN KEY (created_by) REFERENCES user (id)
 );
 
@@ -50,4 +50,3 @@ CREATE TABLE location (
     created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (created_by) REFERENCES user (id)
 );
-
@@ -0,0 +1,77 @@
+import os
+
+from flask import current_app
+from passlib.context import CryptContext
+
+
+# Password hashing context. The bcrypt cost can be tuned per-deployment via the
+# BCRYPT_ROUNDS environment variable (each increment doubles the hashing time).
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    bcrypt__rounds=int(os.environ.get("BCRYPT_ROUNDS", "10")),
+    deprecated="auto"
+)
+
+
+def verify_password(password, password_hash):
+    """
+    Check a plain text password against a stored password hash.
+
+    Hashes created by pwd_context are verified with bcrypt. Hashes that pwd_context does
+    not recognise are assumed to be legacy Werkzeug hashes (pbkdf2:sha256) created before
+    the switch to bcrypt, and are verified with check_password_hash().
+
+    Args:
+        password (str): The plain text password submitted by the user.
+        password_hash (str): The hash stored against the user record.
+
+    Returns:
+        bool: True if the password matches the stored hash, otherwise False.
+    """
+
+    if pwd_context.identify(password_hash) is None:
+        # Only needed for legacy hashes, so imported on first use
+        from werkzeug.security import check_password_hash
+        
+        return check_password_hash(password_hash, password)
+
+    return pwd_context.verify(password, password_hash)
+
+
+def needs_rehash(password_hash):
+    """
+    Check whether a stored password hash should be replaced with a fresh pwd_context hash.
+
+    Returns True for legacy Werkzeug hashes and for any hash pwd_context considers
+    deprecated.
+
+    Args:
+        password_hash (str): The hash stored against the user record.
+
+    Returns:
+        bool: True if the hash should be regenerated on the next successful login.
+    """
+
+    if pwd_context.identify(password_hash) is None:
+        return True
+
+    return pwd_context.needs_update(password_hash)
+
+
+def run_in_pool(func, *args):
+    """
+    Run a password hashing function on the app's password hashing thread pool.
+
+    The pool is created in create_app() with one worker per CPU. bcrypt releases the GIL while
+    hashing, so under a threaded server other requests keep being served while a hash runs, and
+    bursts of logins are capped at one hash per CPU instead of oversubscribing the host.
+
+    Args:
+        func (function): The function to run, e.g. pwd_context.hash or verify_password.
+        *args: Positional arguments passed to func.
+
+    Returns:
+        The return value of func.
+    """
+
+    return current_app.extensions["pw_pool"].submit(func, *args).result()
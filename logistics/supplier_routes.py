@@ -1,109 +1,142 @@
+import sqlite3
+
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, current_app, flash, g, redirect, render_template, request, url_for
 )
 from werkzeug.exceptions import abort
 
 from logistics.auth import supplier_only
 from logistics.db import get_db
 from logistics.forms import BidForm
+from logistics.views import MSG_DATABASE_BUSY, paginate, stream_page
 
 bp = Blueprint("supplier_routes", __name__)
 
+
+SQL_INSERT_BID = """
+    INSERT INTO bid (request_id, created_by, bid_amount)
+    VALUES (?, ?, ?)
+"""
+
+# Only moves requests out of 'Awaiting bids', so the row isn't rewritten once bids have been received
+SQL_MARK_BIDS_RECEIVED = """
+    UPDATE request SET request_status = 'Bid(s) received'
+    WHERE id = ? AND request_status = 'Awaiting bids'
+"""
+
+SQL_SUPPLIER_REQUESTS = """
+    SELECT 
+        r.id AS request_id, 
+        collection_date, 
+        delivery_date, 
+        collection_address, 
+        delivery_address, 
+        pallets,
+        weight,
+        r.company,
+        CASE
+            WHEN b.id IS NULL AND r.request_status <> 'Complete' THEN 'not_bid'
+            WHEN b.id IS NOT NULL AND r.request_status <> 'Complete' THEN 'bid'
+            WHEN b.bid_status <> 'Rejected' THEN 'won'
+        END AS bucket
+    FROM request r
+    LEFT JOIN bid b 
+        ON b.request_id = r.id AND b.created_by IN (SELECT id FROM user WHERE company = ?)
+    WHERE bucket IS NOT NULL AND (
+        r.request_status <> 'Complete'
+        OR EXISTS (
+            SELECT 1
+            FROM bid wb
+            WHERE wb.request_id = r.id 
+                AND wb.bid_status <> 'Rejected' 
+                AND wb.created_by IN (SELECT id FROM user WHERE company = ?)
+        )
+    )
+    ORDER BY r.id
+    LIMIT ? OFFSET ?
+"""
+
+SQL_GET_REQUEST = """
+    SELECT 
+        r.id, 
+        collection_address, 
+        delivery_address, 
+        collection_date, 
+        delivery_date,
+        pallets,
+        weight,
+        request_status
+    FROM request AS r
+    WHERE r.id = ?
+"""
+
+SQL_GET_COMPANY_BID = """
+    SELECT 
+    b.id,
+    request_id,
+    bid_amount,
+    bid_status
+    FROM bid b
+    JOIN user u
+        ON b.created_by = u.id AND u.company = ?
+    WHERE request_id = ?
+"""
+
+SQL_LIST_BIDS = """
+    SELECT 
+        b.id,
+        b.request_id,
+        b.bid_amount,
+        b.created_date,
+        b.bid_status
+    FROM bid b
+    JOIN user u
+        ON b.created_by = u.id AND u.company = ?
+    ORDER BY b.created_date DESC, b.id DESC
+    LIMIT ? OFFSET ?
+"""
+
+
+MSG_REQUEST_NOT_FOUND = "The bid could not be submitted as the request no longer exists."
+
+
 @bp.route("/supplier-requests")
 @supplier_only
 def supplier_requests():
     """
     Display lists of live requests, requests bid on, and requests where bids have been won by the current user's company.
 
-    This endpoint retrieves and categorizes requests based on their status and associated bids. It renders these categorized lists
-    in the 'supplier_requests.html' template.
+    This endpoint retrieves and categorizes requests based on their status and associated bids in a single query. It renders
+    these categorized lists in the 'supplier_requests.html' template. The rows are paginated as a whole with the 'page'
+    query argument, so each page holds up to PAGE_SIZE rows across the three lists.
 
     Returns:
-        Rendered template 'supplier_requests.html' with context variables:
+        Streamed template 'supplier_requests.html' with context variables:
             - live_requests_not_bid: Live requests not yet bid on by the user's company.
             - requests_bid: Requests for which bids have been submitted by the user's company.
             - requests_bid_won: Requests where the user's company bids have been accepted.
+            - page: The current page number.
+            - has_next: Whether there is a further page of requests.
     """
     
     user_company = g.user["company"]
-    db = get_db()
-    
-    live_requests_not_bid = db.execute(
-        """
-        SELECT 
-            r.id AS request_id, 
-            collection_date, 
-            delivery_date, 
-            collection_address, 
-            delivery_address, 
-            pallets,
-            weight,
-            r.company
-        FROM request r
-        LEFT JOIN ( SELECT
-                        b.id, 
-                        b.request_id, 
-                        b.created_by, 
-                        u.company 
-                    FROM bid b
-                    LEFT JOIN user u
-                        ON u.id = b.created_by
-                    WHERE u.company = ?) cb
-            ON cb.request_id = r.id
-        WHERE cb.company is not ? AND r.request_status is not 'Complete'
-        ORDER BY r.id
-        """, (user_company, user_company)
-    ).fetchall()
     
-    requests_bid = db.execute(
-        """
-        SELECT 
-            r.id AS request_id, 
-            collection_date, 
-            delivery_date, 
-            collection_address, 
-            delivery_address, 
-            pallets,
-            weight,
-            r.company,
-            b.id AS bid_id
-        FROM request r
-        LEFT JOIN bid b 
-            ON r.id = b.request_id
-        LEFT JOIN user u
-            ON u.id = b.created_by
-        WHERE b.id is not null AND u.company = ? AND r.request_status is not 'Complete'
-        ORDER BY r.id
-        """, (user_company,)
-    ).fetchall()
+    # One query covers all three lists: each request is joined to the company's bids on it (if any)
+    # and tagged with the list it belongs to, then split into the lists in Python.
+    # Complete requests are skipped up front by the EXISTS check unless the company won them.
+    rows, page, has_next = paginate(SQL_SUPPLIER_REQUESTS, (user_company, user_company))
     
-    requests_bid_won = db.execute(
-        """
-        SELECT 
-            r.id AS request_id, 
-            collection_date, 
-            delivery_date, 
-            collection_address, 
-            delivery_address, 
-            pallets,
-            weight,
-            r.company,
-            b.id AS bid_id
-        FROM request r
-        LEFT JOIN bid b 
-            ON r.id = b.request_id
-        LEFT JOIN user u
-            ON u.id = b.created_by
-        WHERE b.bid_status is not 'Rejected' AND u.company = ? AND r.request_status = 'Complete'
-        ORDER BY r.id
-        """, (user_company,)
-    ).fetchall()
+    buckets = {"not_bid": [], "bid": [], "won": []}
+    for row in rows:
+        buckets[row["bucket"]].append(row)
     
-    return render_template(
+    return stream_page(
         "supplier/supplier_requests.html",
-        live_requests_not_bid=live_requests_not_bid,
-        requests_bid=requests_bid,
-        requests_bid_won=requests_bid_won
+        live_requests_not_bid=buckets["not_bid"],
+        requests_bid=buckets["bid"],
+        requests_bid_won=buckets["won"],
+        page=page,
+        has_next=has_next
     )
 
 
@@ -126,36 +159,9 @@ def supplier_request(id):
     """
     
     db = get_db()
-    request = db.execute(
-        """
-        SELECT 
-            r.id, 
-            collection_address, 
-            delivery_address, 
-            collection_date, 
-            delivery_date,
-            pallets,
-            weight,
-            request_status
-        FROM request AS r
-        WHERE r.id = ?
-        """, (id,)
-    ).fetchone()
+    request = db.execute(SQL_GET_REQUEST, (id,)).fetchone()
     
-    bid = db.execute(
-        """
-        SELECT 
-        b.id,
-        request_id,
-        bid_amount,
-        bid_status,
-        b.created_date
-        FROM bid b
-        LEFT JOIN user u
-            ON b.created_by = u.id
-        WHERE request_id = ? AND u.company = ?
-        """, (id, g.user["company"],)
-    ).fetchone()
+    bid = db.execute(SQL_GET_COMPANY_BID, (g.user["company"], id)).fetchone()
     
     if request is None:
         abort(404, f"Post id {id} doesn't exist.")
@@ -173,35 +179,24 @@ def my_bids():
     """
     Display a list of bids submitted by the current user's company.
 
-    This endpoint retrieves all bids submitted by users belonging to the current user's company 
-    and renders them in the 'my_bids.html' template.
+    This endpoint retrieves one page of bids submitted by users belonging to the current user's company,
+    selected with the 'page' query argument, and renders them in the 'my_bids.html' template.
 
     Returns:
-        Response: Rendered template 'my_bids.html' with the following context variables:
+        Response: Streamed template 'my_bids.html' with the following context variables:
             - bids: A list of dictionaries, each containing details of a bid submitted by the current user's company. 
+            - page: The current page number.
+            - has_next: Whether there is a further page of bids.
     """
     
-    db = get_db()
     user_company = g.user["company"]
-    my_bids = db.execute(
-        """
-        SELECT 
-            b.id,
-            b.request_id,
-            b.bid_amount,
-            b.created_date,
-            b.bid_status
-        FROM bid b
-        LEFT JOIN user u
-            ON b.created_by = u.id
-        WHERE u.company = ?
-        ORDER BY b.created_date DESC
-        """, (user_company, )
-    ).fetchall()
+    my_bids, page, has_next = paginate(SQL_LIST_BIDS, (user_company, ))
 
-    return render_template(
+    return stream_page(
         "/supplier/my_bids.html",
-        bids=my_bids
+        bids=my_bids,
+        page=page,
+        has_next=has_next
     )
     
 
@@ -235,27 +230,21 @@ def submit_bid(id):
         created_by = g.user["id"]
         bid_amount = form.bid_amount.data
 
+        db = get_db()
+        
         try:
-            db = get_db()
-            db.execute(
-                """
-                INSERT INTO bid (request_id, created_by, bid_amount)
-                VALUES (?, ?, ?)                
-                """, (id, created_by, bid_amount)
-            )
-            
-            db.execute(
-                """
-                UPDATE request SET request_status = "Bid(s) received"
-                WHERE id = ?
-                """, (id, )
-            )
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute(SQL_INSERT_BID, (id, created_by, bid_amount))
+                db.execute(SQL_MARK_BIDS_RECEIVED, (id, ))
              
-            db.commit()
             return redirect(url_for("supplier_routes.my_bids"))
-        except Exception as e:
-            db.rollback()
-            flash(f"An error occurred while submitting the bid: {str(e)}", "error")
+        except sqlite3.IntegrityError:
+            current_app.logger.exception("Failed to submit bid for request %s", id)
+            flash(MSG_REQUEST_NOT_FOUND, "error")
+        except sqlite3.OperationalError:
+            current_app.logger.exception("Failed to submit bid for request %s", id)
+            flash(MSG_DATABASE_BUSY, "error")
         
     return render_template(
         "supplier/submit_bid.html",
@@ -0,0 +1,63 @@
+from flask import current_app, get_flashed_messages, request, stream_template
+
+from logistics.db import get_db
+
+
+# Shown when a write fails because another connection holds the database lock for too long
+MSG_DATABASE_BUSY = "The database is busy, please try again in a moment."
+
+# Highest page number accepted by paginate(), keeping the offset within SQLite's integer range
+MAX_PAGE = 100000
+
+
+def paginate(query, params):
+    """
+    Run a list query for the page selected by the 'page' query argument.
+
+    The query must end with "LIMIT ? OFFSET ?"; the limit and offset are appended to params.
+    The page number is clamped between 1 and MAX_PAGE. The page size is set by the PAGE_SIZE config
+    value. One extra row is fetched to find out whether there is a further page, without counting
+    the full result set.
+
+    Args:
+        query (str): SQL query ending with "LIMIT ? OFFSET ?".
+        params (tuple): Parameters for the query's other placeholders.
+
+    Returns:
+        tuple: A tuple containing:
+            - rows: The rows for the current page.
+            - page: The current page number.
+            - has_next: Whether there is a further page of rows.
+    """
+    
+    page = min(max(request.args.get("page", 1, type=int), 1), MAX_PAGE)
+    page_size = current_app.config["PAGE_SIZE"]
+    
+    rows = get_db().execute(
+        query,
+        (*params, page_size + 1, (page - 1) * page_size)
+    ).fetchall()
+    
+    return rows[:page_size], page, len(rows) > page_size
+
+
+def stream_page(template_name, **context):
+    """
+    Render a list page as a streamed response, so the first rows reach the browser while the
+    rest of the page is still being rendered.
+
+    The session cookie is sent with the response headers, before the template is rendered, so any
+    flashed messages are taken from the session here first. Otherwise the template would read them
+    after the cookie was sent and the same messages would be shown again on the next page.
+
+    Args:
+        template_name (str): The template to render.
+        **context: Variables passed to the template.
+
+    Returns:
+        Response: A streamed response rendering the template.
+    """
+
+    get_flashed_messages()
+
+    return stream_template(template_name, **context)